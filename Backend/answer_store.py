@@ -0,0 +1,79 @@
+import hashlib
+
+# Shared, user-independent answers (filled by warmup.py, read by /ask)
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+def question_key(question: str, subject_key: str) -> str:
+    """Stable key for a question: changes only when the wording changes"""
+    raw = f"{subject_key}\n{normalize_question(question)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def get_stored_answer(cur, question: str, subject_key: str):
+    """Return the stored row for a question, or None"""
+    cur.execute(
+        "SELECT answer, deep_explanation, source, question_type FROM answer_store WHERE question_hash=%s",
+        (question_key(question, subject_key),)
+    )
+    return cur.fetchone()
+
+def get_stored_keys(cur, subject_key: str) -> dict:
+    """Map question_hash -> has_deep_explanation for one subject"""
+    cur.execute(
+        "SELECT question_hash, deep_explanation IS NOT NULL FROM answer_store WHERE subject=%s",
+        (subject_key,)
+    )
+    return {row[0]: bool(row[1]) for row in cur.fetchall()}
+
+def save_answer(db, question: str, subject_key: str, answer: str,
+                source: str, question_type: str, deep_explanation: str = None):
+    """Insert or refresh a stored answer"""
+    cur = db.cursor()
+    try:
+        cur.execute(
+            """
+            INSERT INTO answer_store
+                (question_hash, subject, question, answer, deep_explanation, source, question_type)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                answer=VALUES(answer),
+                deep_explanation=COALESCE(VALUES(deep_explanation), deep_explanation),
+                source=VALUES(source),
+                question_type=VALUES(question_type)
+            """,
+            (question_key(question, subject_key), subject_key, question, answer,
+             deep_explanation, source, question_type)
+        )
+        db.commit()
+    finally:
+        cur.close()
+
+def save_deep_explanation(db, question: str, subject_key: str, deep_explanation: str):
+    cur = db.cursor()
+    try:
+        cur.execute(
+            "UPDATE answer_store SET deep_explanation=%s WHERE question_hash=%s",
+            (deep_explanation, question_key(question, subject_key))
+        )
+        db.commit()
+    finally:
+        cur.close()
+
+def prune_answers(db, subject_key: str, keep_keys) -> int:
+    """Delete stored answers for questions no longer in the bank"""
+    keep_keys = list(keep_keys)
+    cur = db.cursor()
+    try:
+        if keep_keys:
+            placeholders = ", ".join(["%s"] * len(keep_keys))
+            cur.execute(
+                f"DELETE FROM answer_store WHERE subject=%s AND question_hash NOT IN ({placeholders})",
+                (subject_key, *keep_keys)
+            )
+        else:
+            cur.execute("DELETE FROM answer_store WHERE subject=%s", (subject_key,))
+        db.commit()
+        return cur.rowcount
+    finally:
+        cur.close()
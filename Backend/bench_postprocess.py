@@ -0,0 +1,147 @@
+"""
+Benchmark for answer post-processing.
+
+Compares the previous is_quality_answer + sanitize_response pair with the
+single-pass AnswerProcessor on typical, large and adversarial outputs,
+whole and streamed in small chunks, and checks that sanitized text matches.
+
+Usage (from the Backend directory):
+    python bench_postprocess.py
+    python bench_postprocess.py --runs 20
+"""
+
+import argparse
+import base64
+import random
+import time
+
+from postprocess import AnswerProcessor, process_answer
+
+# ================= PREVIOUS IMPLEMENTATION =================
+
+def legacy_sanitize_response(text):
+    if not isinstance(text, str):
+        return ""
+    text = ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
+    text = text.replace('\u0008', '')
+    text = text.encode('utf-8', errors='ignore').decode('utf-8')
+    text = '\n'.join(line.rstrip() for line in text.split('\n'))
+    return text.strip()
+
+def legacy_is_quality_answer(answer):
+    if not answer or not isinstance(answer, str):
+        return False
+    answer_clean = answer.strip()
+    if len(answer_clean) < 50:
+        return False
+    if answer_clean.count("\n") > 20 and len(answer_clean) < 200:
+        return False
+    if answer_clean.count("...") > 3:
+        return False
+    words = answer_clean.lower().split()
+    if len(words) > 5:
+        word_counts = {}
+        for word in words:
+            word_counts[word] = word_counts.get(word, 0) + 1
+        for count in word_counts.values():
+            if count > len(words) * 0.3:
+                return False
+    if 'eta eta eta' in answer_clean.lower():
+        return False
+    if '\ufffd' in answer_clean or answer_clean.count('?') > len(answer_clean) * 0.2:
+        return False
+    return True
+
+def legacy(text):
+    ok = legacy_is_quality_answer(text)
+    return legacy_sanitize_response(text), ok
+
+# ================= INPUTS =================
+
+TYPICAL = """**Gradient Descent**
+
+**Definition:** Gradient descent is an optimization algorithm that minimizes a loss function by
+repeatedly moving the model parameters in the direction of the negative gradient.
+
+**Explanation:** At each step the gradient of the loss with respect to every parameter is
+computed, scaled by the learning rate, and subtracted from the parameters.\t
+Stochastic gradient descent uses one sample (or a mini-batch) per step, which is noisier but
+much cheaper on large datasets.
+
+**Key Points:**
+- Learning rate controls the step size
+- Too large a rate diverges; too small a rate converges slowly
+- Mini-batches balance noise and cost
+"""
+
+def make_inputs():
+    rng = random.Random(0)
+    vocab = [f"w{i}" for i in range(5000)]
+    large = " ".join(rng.choice(vocab) for _ in range(200_000))
+    large = "\n".join(large[i:i + 120] + "  " for i in range(0, len(large), 120))
+    return {
+        "typical": TYPICAL,
+        "large (1.2 MB prose)": large,
+        "looping output": "The model learns the weights. " * 20_000,
+        "emphasis": "This is a very very very important concept in machine learning that "
+                    "every student should understand clearly before the exam.",
+        "stutter (3x)": TYPICAL + " eta eta eta",
+        "stutter (4x)": TYPICAL + " eta eta eta eta",
+        "stutter (scattered)": " ".join(w + " " + w if i % 5 == 0 else w
+                                        for i, w in enumerate(TYPICAL.split())),
+        "base64 blob": "Encoded payload: " + base64.b64encode(rng.randbytes(750_000)).decode(),
+        "url blob": "See https://example.com/" + "a1/" * 300_000 + " for details.",
+        "whitespace runs": ("word" + " " * 5_000) * 200 + "\n",
+        "control chars": "".join(rng.choice("abc \x00\x08\x1b\t\r\n") for _ in range(500_000)),
+        "blank lines": "line\n" + "\n" * 200_000 + "end of answer, with enough text to pass length",
+        "lone surrogates": ("text \ud800 more " * 20_000),
+    }
+
+# Verdicts the new engine must give, whatever the legacy code said
+EXPECTED = {
+    "typical": True,
+    "emphasis": True,
+    "stutter (3x)": False,
+    "stutter (4x)": False,
+    "stutter (scattered)": False,
+    "looping output": False,
+}
+
+# ================= TIMING =================
+
+def best_time(fn, runs):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def streamed(text, chunk_size=4):
+    processor = AnswerProcessor()
+    out = [processor.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+    processor.finish()
+    return "".join(out), processor.is_quality()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark answer post-processing")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'input':<24}{'legacy':>10}{'single-pass':>13}{'streamed':>11}  verdict (legacy/new)")
+    for name, text in make_inputs().items():
+        old_text, old_ok = legacy(text)
+        new_text, new_ok = process_answer(text)
+        stream_text, stream_ok = streamed(text)
+        assert new_text == old_text, f"{name}: sanitized text differs from legacy"
+        assert (stream_text, stream_ok) == (new_text, new_ok), f"{name}: streamed result differs"
+        if name in EXPECTED:
+            assert new_ok == EXPECTED[name], f"{name}: expected verdict {EXPECTED[name]}, got {new_ok}"
+
+        t_old = best_time(lambda: legacy(text), args.runs)
+        t_new = best_time(lambda: process_answer(text), args.runs)
+        t_stream = best_time(lambda: streamed(text), 1)
+        print(f"{name:<24}{t_old * 1000:>8.1f}ms{t_new * 1000:>11.1f}ms{t_stream * 1000:>9.1f}ms  {old_ok}/{new_ok}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Startup-time benchmark for the backend.
+
+Each measurement runs in a fresh interpreter so module caches don't hide
+cold-start cost. Reports:
+  - import time of faiss_groq_app (what every worker pays)
+  - which heavy modules that import pulled in (should be none)
+  - time for the lifespan preload of configured subject indexes
+
+Usage (from the Backend directory):
+    python bench_startup.py
+    python bench_startup.py --runs 10
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["faiss", "numpy", "groq", "langchain_ollama"]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import faiss_groq_app
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+PRELOAD_SNIPPET = """
+import json, time
+import faiss_groq_app
+start = time.perf_counter()
+timings = faiss_groq_app.preload_subjects()
+print(json.dumps({"seconds": time.perf_counter() - start, "subjects": timings}))
+"""
+
+def run_snippet(snippet):
+    result = subprocess.run(
+        [sys.executable, "-c", snippet],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def summarize(label, samples):
+    print(f"{label}: median {statistics.median(samples) * 1000:.0f} ms, "
+          f"min {min(samples) * 1000:.0f} ms, max {max(samples) * 1000:.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend cold-start time")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [run_snippet(IMPORT_SNIPPET) for _ in range(args.runs)]
+    summarize("import faiss_groq_app", [r["seconds"] for r in imports])
+    loaded = imports[-1]["loaded"]
+    print(f"heavy modules loaded at import: {', '.join(loaded) if loaded else 'none'}")
+
+    preloads = [run_snippet(PRELOAD_SNIPPET) for _ in range(args.runs)]
+    summarize("lifespan preload", [r["seconds"] for r in preloads])
+    for subject, seconds in preloads[-1]["subjects"].items():
+        print(f"  {subject}: {seconds * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
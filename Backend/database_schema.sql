@@ -28,6 +28,24 @@ CREATE TABLE IF NOT EXISTS history (
     INDEX idx_user_question (user_id, question)
 );
 
+"""
+OPTIONAL TABLE: answer_store
+(Shared answers precomputed by warmup.py; /ask checks it before calling the LLM)
+"""
+
+CREATE TABLE IF NOT EXISTS answer_store (
+    question_hash CHAR(64) PRIMARY KEY,
+    subject VARCHAR(100) NOT NULL,
+    question VARCHAR(500) NOT NULL,
+    answer LONGTEXT NOT NULL,
+    deep_explanation LONGTEXT,
+    source VARCHAR(32),
+    question_type VARCHAR(32),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_subject (subject)
+);
+
 """
 Migration Note: If your history table doesn't have 'analogy' and 'subject' columns:
 
@@ -1,33 +1,224 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from groq import Groq
-import faiss
 import pickle
-import numpy as np
 import re
+import csv
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
 from db import get_db
 from fastapi.middleware.cors import CORSMiddleware
-from langchain_ollama import OllamaEmbeddings
 from auth import router as auth_router
+from answer_store import get_stored_answer, save_deep_explanation
+from postprocess import process_answer
 import os
 from dotenv import load_dotenv
 
+# groq, faiss, numpy and langchain_ollama are imported on first use so that
+# workers serving only auth/history routes start without paying for them.
+
 load_dotenv()
 
 # ================= CONFIG =================
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 
+VECTORSTORE_DIR = "vectorstore"
+
 SUBJECTS = {
     "ai": "vectorstore/ai",
     "ml": "vectorstore/ml",
 }
 
-client = Groq(api_key=GROQ_API_KEY)
+# Subject key that searches every registered index (also used for unknown subjects)
+ALL_SUBJECTS = "all"
+
+# Comma-separated subject keys to load before the worker reports ready.
+# Defaults to every registered subject; set to an empty string to skip preloading.
+PRELOAD_SUBJECTS = os.getenv("PRELOAD_SUBJECTS")
+
+# If set, a subject that fails to preload aborts startup instead of being skipped
+PRELOAD_STRICT = os.getenv("PRELOAD_STRICT", "").lower() in ("1", "true", "yes")
+
+# Seconds before a subject whose index failed to load is tried again
+SUBJECT_RETRY_SECONDS = int(os.getenv("SUBJECT_RETRY_SECONDS", "60"))
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Return the shared Groq client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from groq import Groq
+                _client = Groq(api_key=GROQ_API_KEY)
+    return _client
+
+# ================= LOAD FAISS =================
+
+_subject_cache = {}
+_subject_lock = threading.Lock()
+_embeddings = None
+_registry = None
+_subject_mtimes = {}
+
+# Subjects whose index failed to load: {subject: (error, time)}. They are
+# retried after SUBJECT_RETRY_SECONDS, so a missing index doesn't cost a
+# filesystem hit on every request but a rebuilt one is picked up.
+_failed_subjects = {}
+
+def _recent_failure(subject):
+    """Return the load error for a subject if it failed recently, else None"""
+    failure = _failed_subjects.get(subject)
+    if not failure:
+        return None
+    error, failed_at = failure
+    if time.monotonic() - failed_at >= SUBJECT_RETRY_SECONDS:
+        _failed_subjects.pop(subject, None)
+        return None
+    return error
+
+def _index_mtimes(path):
+    return tuple(
+        os.path.getmtime(f"{path}/{name}") if os.path.exists(f"{path}/{name}") else None
+        for name in ("index.faiss", "texts.pkl")
+    )
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        from langchain_ollama import OllamaEmbeddings
+        _embeddings = OllamaEmbeddings(model="nomic-embed-text")
+    return _embeddings
+
+def registered_subjects(refresh=False):
+    """
+    SUBJECTS plus any vectorstore/<subject> directory holding an index.
+
+    The directory is scanned once per worker. refresh=True rescans it, forgets
+    load failures and drops cached indexes that were removed or rebuilt.
+    """
+    global _registry
+    if _registry is None or refresh:
+        subjects = dict(SUBJECTS)
+        if os.path.isdir(VECTORSTORE_DIR):
+            for name in sorted(os.listdir(VECTORSTORE_DIR)):
+                path = f"{VECTORSTORE_DIR}/{name}"
+                # ALL_SUBJECTS is reserved for the multi-subject search
+                if name not in subjects and name != ALL_SUBJECTS and os.path.isfile(f"{path}/index.faiss"):
+                    subjects[name] = path
+        _registry = subjects
+
+        if refresh:
+            _failed_subjects.clear()
+            with _subject_lock:
+                for subject in list(_subject_cache):
+                    path = subjects.get(subject)
+                    if not path or _index_mtimes(path) != _subject_mtimes.get(subject):
+                        _subject_cache.pop(subject, None)
+                        _subject_mtimes.pop(subject, None)
+    return _registry
+
+def load_subject(subject, subjects=None):
+    """Load (and cache) the FAISS index and texts for a subject"""
+    cached = _subject_cache.get(subject)
+    if cached:
+        return cached
+    error = _recent_failure(subject)
+    if error:
+        raise error
+
+    path = (subjects or registered_subjects()).get(subject)
+    if not path:
+        raise ValueError(f"Subject not found: {subject}")
+
+    with _subject_lock:
+        cached = _subject_cache.get(subject)
+        if cached:
+            return cached
+        error = _recent_failure(subject)
+        if error:
+            raise error
+
+        import faiss
+
+        try:
+            mtimes = _index_mtimes(path)
+            index = faiss.read_index(f"{path}/index.faiss")
+            with open(f"{path}/texts.pkl", "rb") as f:
+                texts = pickle.load(f)
+
+            if index.ntotal == 0 or not texts:
+                raise ValueError(f"Empty vectorstore for subject: {subject}")
+        except Exception as e:
+            _failed_subjects[subject] = (e, time.monotonic())
+            raise
+
+        _subject_cache[subject] = (index, texts, get_embeddings())
+        _subject_mtimes[subject] = mtimes
+        return _subject_cache[subject]
+
+def preload_subjects(subjects=None):
+    """
+    Load and validate subject indexes ahead of the first request.
+
+    Returns: {subject: seconds taken}. Subjects that fail to load, or whose
+    vector count doesn't match their texts, are skipped or only warned about;
+    with PRELOAD_STRICT set the error is raised instead.
+    """
+    if subjects is None:
+        if PRELOAD_SUBJECTS is None:
+            subjects = list(registered_subjects())
+        else:
+            subjects = [s.strip() for s in PRELOAD_SUBJECTS.split(",") if s.strip()]
 
-app = FastAPI()
+    timings = {}
+    for subject in subjects:
+        start = time.perf_counter()
+        try:
+            index, texts, _ = load_subject(subject)
+            if index.ntotal != len(texts):
+                message = f"index has {index.ntotal} vectors but {len(texts)} texts"
+                if PRELOAD_STRICT:
+                    raise ValueError(f"{subject}: {message}")
+                print(f"[preload] {subject}: warning, {message}")
+        except Exception as e:
+            if PRELOAD_STRICT:
+                raise
+            print(f"[preload] {subject}: skipped ({e})")
+            continue
+        timings[subject] = time.perf_counter() - start
+        print(f"[preload] {subject}: ready in {timings[subject]:.2f}s")
+
+    if subjects:
+        import numpy  # noqa: F401  (used by search_faiss)
+        get_client()
+    return timings
+
+@asynccontextmanager
+async def lifespan(app):
+    preload_subjects()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(auth_router)
 
+@app.post("/subjects/reload")
+def reload_subjects():
+    """Rescan vectorstore/ and reload indexes that were added, rebuilt or failed"""
+    subjects = registered_subjects(refresh=True)
+    timings = preload_subjects()
+    return {
+        "subjects": list(subjects),
+        "loaded": list(timings),
+    }
+
 # ================= CORS =================
 
 app.add_middleware(
@@ -38,20 +229,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ================= LOAD FAISS =================
-
-def load_subject(subject):
-    path = SUBJECTS.get(subject)
-    if not path:
-        raise ValueError(f"Subject not found: {subject}")
-
-    index = faiss.read_index(f"{path}/index.faiss")
-    with open(f"{path}/texts.pkl", "rb") as f:
-        texts = pickle.load(f)
-
-    embeddings = OllamaEmbeddings(model="nomic-embed-text")
-    return index, texts, embeddings
-
 # ================= TEXT UTILITIES =================
 
 def clean_text(text):
@@ -148,18 +325,81 @@ def classify_question(question: str) -> str:
 
 # ================= SEARCH =================
 
-def search_faiss(query, index, texts, embeddings):
+def embed_query(query, embeddings):
+    import numpy as np
+
     vec = embeddings.embed_query(query)
-    vec = np.array(vec, dtype="float32").reshape(1, -1)
+    return np.array(vec, dtype="float32").reshape(1, -1)
+
+def search_index(vec, index, texts, k=3):
+    """
+    Search one index with a precomputed query vector.
 
-    _, idx = index.search(vec, 3)
+    Returns: [(score, text)] with score normalized to 0..1 (higher is closer)
+    so hits from different indexes can be ranked together.
+    """
+    import faiss
+
+    distances, idx = index.search(vec, k)
 
     results = []
-    for i in idx[0]:
-        if i < len(texts):
-            results.append(extract_text(texts[i]))
+    for dist, i in zip(distances[0], idx[0]):
+        if 0 <= i < len(texts):
+            if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+                score = (float(dist) + 1.0) / 2.0
+            else:
+                score = 1.0 / (1.0 + float(dist))
+            results.append((score, extract_text(texts[i])))
+    return results
+
+def search_faiss(query, index, texts, embeddings):
+    vec = embed_query(query, embeddings)
+    return " ".join(text for _, text in search_index(vec, index, texts))
 
-    return " ".join(results)
+_search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="faiss-search")
+
+def search_all_subjects(query, subjects, k=3):
+    """
+    Search every subject index in `subjects` with one shared query embedding.
+
+    Indexes are searched concurrently (FAISS releases the GIL) and hits are
+    merged by normalized score.
+
+    Subjects that failed to load before are skipped without touching disk.
+
+    Returns: (context, matched_subject) or ("", None) if nothing was found
+    """
+    loaded = {}
+    for subject in subjects:
+        if _recent_failure(subject):
+            continue
+        try:
+            loaded[subject] = load_subject(subject, subjects)
+        except Exception:
+            continue
+    if not loaded:
+        return "", None
+
+    vec = embed_query(query, get_embeddings())
+
+    futures = {
+        _search_pool.submit(search_index, vec, index, texts, k): subject
+        for subject, (index, texts, _) in loaded.items()
+        if index.d == vec.shape[1]
+    }
+
+    hits = []
+    for future, subject in futures.items():
+        try:
+            hits.extend((score, subject, text) for score, text in future.result())
+        except Exception:
+            continue
+    if not hits:
+        return "", None
+
+    hits.sort(key=lambda hit: hit[0], reverse=True)
+    top = hits[:k]
+    return " ".join(text for _, _, text in top), top[0][1]
 
 # ================= MODELS =================
 
@@ -178,70 +418,6 @@ def map_subject(subject):
         return "ml"
     return subject.lower()
 
-# ================= RESPONSE SANITIZATION =================
-
-def sanitize_response(text: str) -> str:
-    """Clean response before saving to database"""
-    if not isinstance(text, str):
-        return ""
-    
-    # Remove non-printable characters (keep only printable ASCII and common unicode)
-    text = ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
-    
-    # Remove backspace characters
-    text = text.replace('\u0008', '')
-    
-    # Remove broken unicode sequences
-    text = text.encode('utf-8', errors='ignore').decode('utf-8')
-    
-    # Clean up excessive whitespace
-    text = '\n'.join(line.rstrip() for line in text.split('\n'))
-    
-    return text.strip()
-
-# ================= ANSWER QUALITY CONTROL =================
-
-def is_quality_answer(answer: str) -> bool:
-    """Check if answer meets minimum quality standards"""
-    if not answer or not isinstance(answer, str):
-        return False
-    
-    answer_clean = answer.strip()
-    
-    # Check for minimum length
-    if len(answer_clean) < 50:
-        return False
-    
-    # Check if it's just empty structure
-    if answer_clean.count("\n") > 20 and len(answer_clean) < 200:
-        return False
-    
-    # Check for obvious nonsense patterns
-    if answer_clean.count("...") > 3:
-        return False
-    
-    # Check for repeated words (corrupted text indicator)
-    words = answer_clean.lower().split()
-    if len(words) > 5:
-        # Check if same word repeats too much
-        word_counts = {}
-        for word in words:
-            word_counts[word] = word_counts.get(word, 0) + 1
-        # If any word appears more than 30% of total, it's likely corrupted
-        for count in word_counts.values():
-            if count > len(words) * 0.3:
-                return False
-    
-    # Check for strange repeated patterns like "eta eta eta"
-    if 'eta eta eta' in answer_clean.lower():
-        return False
-    
-    # Check for broken unicode or encoding issues
-    if '\ufffd' in answer_clean or answer_clean.count('?') > len(answer_clean) * 0.2:
-        return False
-    
-    return True
-
 # ================= LLM GENERATION =================
 
 def generate_subject_answer(question: str, context: str = None) -> str:
@@ -270,7 +446,7 @@ Answer based on material only."""
             # WITHOUT RAG CONTEXT - Pure LLM
             prompt = f"Q: {question}\n\nAnswer clearly."
 
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
@@ -289,7 +465,7 @@ def generate_guidance_answer(question: str) -> str:
 
     prompt = f"Student asks: {question}\n\nRespond with practical mentor guidance."
 
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
@@ -311,7 +487,7 @@ Original answer: {original_answer}
 
 Explain differently using a relatable analogy."""
 
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
@@ -323,6 +499,62 @@ Explain differently using a relatable analogy."""
 
     return response.choices[0].message.content
 
+def retrieve_context(question: str, subject_key: str):
+    """
+    Return cleaned RAG context for a question.
+
+    Unknown subjects, ALL_SUBJECTS and subjects whose own index can't be
+    loaded search every registered index instead.
+
+    Returns: (context, matched_subject), or (None, None) if nothing relevant
+    """
+    try:
+        subjects = registered_subjects()
+        loaded = None
+        if subject_key != ALL_SUBJECTS and subject_key in subjects:
+            try:
+                loaded = load_subject(subject_key, subjects)
+            except Exception:
+                loaded = None
+
+        if loaded:
+            index, texts, embeddings = loaded
+            raw_context = search_faiss(question, index, texts, embeddings)
+            matched_subject = subject_key
+        else:
+            raw_context, matched_subject = search_all_subjects(question, subjects)
+        context = clean_text(raw_context)
+        context = limit_text(context, max_chars=1500)
+    except Exception:
+        return None, None
+
+    if not is_relevant_result(question, context):
+        return None, None
+    return context, matched_subject
+
+def answer_question(question: str, subject_key: str):
+    """
+    Classify and answer a question.
+
+    Returns: (answer, source, question_type, matched_subject)
+    """
+    question_type = classify_question(question)
+
+    if question_type == "GUIDANCE_QUESTION":
+        # Skip RAG, use mentoring mode
+        return generate_guidance_answer(question), "mentoring", question_type, None
+
+    # SUBJECT_QUESTION or GENERAL_CHAT
+    # Try RAG for subject question, skip for general chat
+    context = None
+    matched_subject = None
+    if question_type == "SUBJECT_QUESTION":
+        context, matched_subject = retrieve_context(question, subject_key)
+
+    source = "rag" if context else "llm"
+    answer = generate_subject_answer(question, context)
+    return answer, source, question_type, matched_subject
+
 # ================= ASK API =================
 
 @app.post("/ask")
@@ -369,40 +601,62 @@ def ask(q: Question):
                 "cached": True
             }
 
-    # ===== CLASSIFY QUESTION =====
-    question_type = classify_question(q.question)
-
-    # ===== GENERATE ANSWER =====
+    # ===== SHARED ANSWER STORE =====
     try:
-        if question_type == "GUIDANCE_QUESTION":
-            # Skip RAG, use mentoring mode
-            answer = generate_guidance_answer(q.question)
-            source = "mentoring"
-        else:
-            # SUBJECT_QUESTION or GENERAL_CHAT
-            # Try RAG for subject question, skip for general chat
-            context = None
-            source = "llm"
-
-            if question_type == "SUBJECT_QUESTION":
+        stored_row = get_stored_answer(cur, q.question, subject_key)
+    except Exception:
+        # Store not migrated yet: fall through to live generation
+        stored_row = None
+
+    if stored_row:
+        deep_exp = None
+        source = "precomputed"
+        if q.request_deep_explanation:
+            deep_exp = stored_row["deep_explanation"]
+            if not deep_exp:
                 try:
-                    index, texts, embeddings = load_subject(subject_key)
-                    raw_context = search_faiss(q.question, index, texts, embeddings)
-                    context = clean_text(raw_context)
-                    context = limit_text(context, max_chars=1500)
-
-                    # Check if context is relevant
-                    if not is_relevant_result(q.question, context):
-                        context = None
-                    else:
-                        source = "rag"
+                    deep_exp = generate_deep_explanation(q.question, stored_row["answer"])
                 except Exception:
-                    context = None
+                    deep_exp = None
+                if deep_exp:
+                    try:
+                        save_deep_explanation(db, q.question, subject_key, deep_exp)
+                    except Exception:
+                        db.rollback()
+            if deep_exp:
+                source = "deep_explanation"
+
+        try:
+            cur.execute(
+                "INSERT INTO history (user_id, question, answer, subject) VALUES (%s, %s, %s, %s)",
+                (q.user_id, q.question, stored_row["answer"], q.subject)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+
+        cur.close()
+        db.close()
+        response = {
+            "answer": stored_row["answer"],
+            "deep_explanation": deep_exp,
+            "cached": True,
+            "source": source,
+            "type": stored_row["question_type"],
+            "matched_subject": None
+        }
+        if q.request_deep_explanation and not deep_exp:
+            response["error"] = "Could not generate deep explanation"
+        return response
 
-            answer = generate_subject_answer(q.question, context)
+    # ===== CLASSIFY AND GENERATE ANSWER =====
+    try:
+        answer, source, question_type, matched_subject = answer_question(q.question, subject_key)
 
-        # ===== QUALITY CHECK =====
-        if not is_quality_answer(answer):
+        # ===== QUALITY CHECK AND SANITIZE (single pass) =====
+        # ISSUE 3: Sanitize response before saving
+        sanitized_answer, is_quality = process_answer(answer)
+        if not is_quality:
             cur.close()
             db.close()
             return {
@@ -410,10 +664,7 @@ def ask(q: Question):
                 "answer": None
             }
 
-        # ===== SANITIZE AND SAVE TO DATABASE =====
-        # ISSUE 3: Sanitize response before saving
-        sanitized_answer = sanitize_response(answer)
-        
+        # ===== SAVE TO DATABASE =====
         try:
             cur.execute(
                 "INSERT INTO history (user_id, question, answer, subject) VALUES (%s, %s, %s, %s)",
@@ -432,7 +683,8 @@ def ask(q: Question):
             "deep_explanation": None,
             "cached": False,
             "source": source,
-            "type": question_type
+            "type": question_type,
+            "matched_subject": matched_subject
         }
 
     except Exception as e:
@@ -470,6 +722,86 @@ def get_history(user_id: int):
 
     return rows
 
+# ================= HISTORY EXPORT =================
+
+EXPORT_COLUMNS = ("id", "question", "answer", "subject", "created_at")
+EXPORT_BATCH_SIZE = 500
+
+def iter_history_rows(user_id: int):
+    """
+    Yield batches of history rows straight from the server.
+
+    Uses an unbuffered cursor so rows are read off the socket as they are
+    consumed instead of being loaded into memory with fetchall().
+    """
+    db = get_db()
+    cur = db.cursor(buffered=False)
+    try:
+        cur.execute("""
+            SELECT id, question, answer, subject, created_at
+            FROM history
+            WHERE user_id=%s
+            ORDER BY created_at DESC
+        """, (user_id,))
+
+        while True:
+            rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            # Client disconnected mid-stream and left rows unread
+            pass
+        db.close()
+
+def export_ndjson(user_id: int):
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for rows in iter_history_rows(user_id):
+        yield "".join(
+            encode({
+                "id": row[0],
+                "question": row[1],
+                "answer": row[2],
+                "subject": row[3],
+                "created_at": row[4].isoformat() if row[4] else None,
+            }) + "\n"
+            for row in rows
+        )
+
+def export_csv(user_id: int):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+
+    for rows in iter_history_rows(user_id):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            (row[0], row[1], row[2], row[3], row[4].isoformat() if row[4] else "")
+            for row in rows
+        )
+        yield buffer.getvalue()
+
+@app.get("/history/{user_id}/export")
+def export_history(user_id: int, format: str = "ndjson"):
+    """Stream a user's full history as NDJSON or CSV"""
+    if format == "ndjson":
+        body, media_type = export_ndjson(user_id), "application/x-ndjson"
+    elif format == "csv":
+        body, media_type = export_csv(user_id), "text/csv"
+    else:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="history_{user_id}.{format}"'}
+    )
+
 @app.get("/history/{user_id}/{date}")
 def get_history_by_date(user_id: int, date: str):
     """Returns all messages for a specific user and date"""
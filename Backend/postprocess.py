@@ -0,0 +1,212 @@
+"""
+Answer post-processing: sanitize and quality-check LLM output in one pass.
+
+AnswerProcessor consumes text in chunks (a whole answer, or tokens as they
+stream in), emits sanitized text as soon as it is final, and keeps running
+statistics for the quality check so the text never has to be re-scanned.
+"""
+
+import re
+from collections import Counter
+
+# ================= CHARACTER CLASSES =================
+
+# Removed anywhere: control characters other than \t \n \r, and lone
+# surrogates (what encode('utf-8', errors='ignore') used to drop)
+_CTRL = r"\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff"
+
+# Whitespace (as str.isspace sees it) except \n, plus removed characters:
+# a run of these right before a newline is trailing line whitespace
+_LINE_WS = r"\t\r \x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000" + _CTRL
+
+# One compiled pass: strip trailing whitespace from every line and drop
+# control characters. The lookbehind only lets a match start at the first
+# character of a whitespace run, so long runs stay linear.
+_CLEAN = re.compile(rf"[{_LINE_WS}](?<![{_LINE_WS}].)[{_LINE_WS}]*(?=\n)|[{_CTRL}]")
+
+# Characters that may be held back at the end of a chunk until we know
+# whether more text follows
+_TRAILING = "".join(chr(c) for c in range(0x21)) + "".join(
+    chr(c) for c in range(0x80, 0x3001) if chr(c).isspace()
+) + "".join(chr(c) for c in range(0xD800, 0xE000))
+
+# ================= QUALITY THRESHOLDS =================
+
+MIN_LENGTH = 50
+MAX_NEWLINES_SHORT = 20         # more newlines than this in < 200 chars = empty structure
+MAX_ELLIPSES = 3
+MAX_WORD_SHARE = 0.3            # one word making up > 30% of the text
+MAX_QUESTION_MARK_SHARE = 0.2   # '?' left behind by broken encoding
+MIN_TRIGRAMS = 20               # only judge trigram diversity on longer answers
+MIN_DISTINCT_TRIGRAMS = 0.5     # looping output repeats the same phrases
+MAX_WORD_RUN = 4                # the same word this many times in a row is always a stutter
+STUTTER_RUN = 3                 # ...and this many already is, unless the word is emphatic
+MAX_REPEAT_SHARE = 0.05         # immediate repeats ("the the") above 5% of words
+MIN_REPEATS = 3                 # ...once there are at least this many
+MAX_NGRAM_WORDS = 2000          # n-gram stats only cover the first words of huge outputs
+
+# Words people repeat for emphasis ("very very very important"); a short run
+# of any other word ("eta eta eta") is treated as corrupted output
+EMPHATIC_WORDS = frozenset({
+    "very", "really", "so", "much", "many", "more", "too", "far", "way",
+    "again", "never", "always", "no", "yes", "ha", "bye", "please",
+})
+
+class AnswerProcessor:
+    """
+    Incremental sanitizer and quality checker for one answer.
+
+        processor = AnswerProcessor()
+        for chunk in stream:
+            send(processor.feed(chunk))
+        processor.finish()
+        ok = processor.is_quality()
+    """
+
+    def __init__(self):
+        self.length = 0
+        self.newlines = 0
+        self.ellipses = 0
+        self.question_marks = 0
+        self.replacement_chars = False
+        self.words = Counter()
+        self.word_total = 0
+        self.trigrams = Counter()
+        self.trigram_total = 0
+        self._pending = ""      # trailing whitespace not yet known to be final
+        self._word_tail = []    # pieces of the last, possibly incomplete, word
+        self.immediate_repeats = 0
+        self.max_run = 0
+        self.stutters = 0       # runs of STUTTER_RUN of a non-emphatic word
+        self._run = 0           # length of the current run of one repeated word
+        self._last_words = []   # previous two words, for trigrams across chunks
+        self._started = False
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk; return the sanitized text that is now final"""
+        keep = len(chunk.rstrip(_TRAILING))
+        if keep == 0:
+            self._pending += chunk
+            return ""
+
+        text = _CLEAN.sub("", self._pending + chunk[:keep])
+        self._pending = chunk[keep:]
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+
+        self._update_stats(text)
+        return text
+
+    def finish(self):
+        """
+        Mark the end of the answer so the last word is counted.
+
+        All text was already returned by feed(); only trailing whitespace,
+        which the sanitizer drops anyway, is discarded here.
+        """
+        self._pending = ""
+        tail, self._word_tail = "".join(self._word_tail), []
+        if tail:
+            self._count(tail, [tail.lower()])
+
+    def _update_stats(self, text):
+        self.length += len(text)
+
+        # Text always ends on a non-whitespace character here, so its last
+        # word may continue in the next chunk; hold it back until then.
+        # rsplit scans only that last word, so a long run without whitespace
+        # (a URL or base64 blob) is buffered in pieces, not re-scanned.
+        last = text.rsplit(None, 1)[-1]
+        if len(last) == len(text):
+            self._word_tail.append(text)
+            return
+
+        body = "".join(self._word_tail) + text[:len(text) - len(last)]
+        self._word_tail = [last]
+        self._count(body, body.lower().split())
+
+    def _count(self, body, words):
+        self.newlines += body.count("\n")
+        self.ellipses += body.count("...")
+        self.question_marks += body.count("?")
+        self.replacement_chars = self.replacement_chars or "\ufffd" in body
+
+        if not words:
+            return
+        self.words.update(words)
+        self.word_total += len(words)
+
+        room = MAX_NGRAM_WORDS - (self.word_total - len(words))
+        if room > 0:
+            window = words[:room]
+            seq = self._last_words + window
+            self.trigrams.update(zip(seq, seq[1:], seq[2:]))
+            self.trigram_total += max(len(seq) - 2, 0)
+
+            prev = self._last_words[-1] if self._last_words else None
+            for word in window:
+                if word == prev and word.isalpha():
+                    self.immediate_repeats += 1
+                    self._run += 1
+                    self.max_run = max(self.max_run, self._run)
+                    if self._run == STUTTER_RUN and word not in EMPHATIC_WORDS:
+                        self.stutters += 1
+                else:
+                    self._run = 1
+                prev = word
+            self._last_words = seq[-2:]
+
+    def is_repetitive(self) -> bool:
+        """Detect looping or stuttering output from word and trigram statistics"""
+        if self.word_total > 5 and max(self.words.values()) > self.word_total * MAX_WORD_SHARE:
+            return True
+
+        if self.trigram_total >= MIN_TRIGRAMS and len(self.trigrams) < self.trigram_total * MIN_DISTINCT_TRIGRAMS:
+            return True
+
+        # Stuttering: a run of a non-emphatic word ("eta eta eta"), a long run
+        # of any word, or many short repeats. "very very very" passes.
+        if self.stutters or self.max_run >= MAX_WORD_RUN:
+            return True
+
+        counted = min(self.word_total, MAX_NGRAM_WORDS)
+        return self.immediate_repeats >= MIN_REPEATS and self.immediate_repeats > counted * MAX_REPEAT_SHARE
+
+    def is_quality(self) -> bool:
+        """Check if the processed answer meets minimum quality standards"""
+        if self.length < MIN_LENGTH:
+            return False
+
+        if self.newlines > MAX_NEWLINES_SHORT and self.length < 200:
+            return False
+
+        if self.ellipses > MAX_ELLIPSES:
+            return False
+
+        if self.replacement_chars or self.question_marks > self.length * MAX_QUESTION_MARK_SHARE:
+            return False
+
+        return not self.is_repetitive()
+
+def process_answer(text):
+    """
+    Sanitize and validate a complete answer.
+
+    Returns: (sanitized_text, is_quality)
+    """
+    if not text or not isinstance(text, str):
+        return "", False
+
+    processor = AnswerProcessor()
+    sanitized = processor.feed(text)
+    processor.finish()
+    return sanitized, processor.is_quality()
+
+def sanitize_response(text: str) -> str:
+    """Clean response before saving to database"""
+    return process_answer(text)[0]
+
+def is_quality_answer(answer: str) -> bool:
+    """Check if answer meets minimum quality standards"""
+    return process_answer(answer)[1]
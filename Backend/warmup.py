@@ -0,0 +1,208 @@
+"""
+Cache warm-up job for the exam question bank.
+
+Reads question banks (QuestionsViewer/data.js by default), answers every
+question through the same pipeline as /ask and stores the results in the
+shared answer_store table that /ask consults before calling the LLM.
+
+The job is resumable and incremental: questions already in the store are
+skipped, so re-running after an interruption or after editing the bank only
+generates answers for new or changed questions.
+
+Usage:
+    python warmup.py
+    python warmup.py --bank ../QuestionsViewer/data.js --workers 4 --rpm 30 --deep
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from db import get_db
+from answer_store import question_key, get_stored_keys, save_answer, save_deep_explanation, prune_answers
+from faiss_groq_app import (
+    registered_subjects,
+    map_subject,
+    answer_question,
+    generate_deep_explanation,
+)
+from postprocess import process_answer, sanitize_response
+
+DEFAULT_BANK = "../QuestionsViewer/data.js"
+
+# ================= QUESTION BANK =================
+
+def load_question_bank(path):
+    """
+    Parse a data.js question bank into {subject_name: [questions]}.
+
+    The bank is a JS object literal; unquoted section keys (partA, partB, ...)
+    are quoted so the literal can be read as JSON.
+    """
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+
+    body = source[source.index("{"):source.rindex("}") + 1]
+    body = re.sub(r'^(\s*)([A-Za-z_]\w*)\s*:', r'\1"\2":', body, flags=re.MULTILINE)
+    body = re.sub(r',(\s*[\]}])', r'\1', body)
+    data = json.loads(body)
+
+    bank = {}
+    for subject_name, sections in data.items():
+        seen = set()
+        questions = []
+        for section in sections.values():
+            for question in section:
+                key = question.strip()
+                if key and key not in seen:
+                    seen.add(key)
+                    questions.append(key)
+        bank[subject_name] = questions
+    return bank
+
+# ================= RATE LIMITING =================
+
+class RateLimiter:
+    """Spaces LLM calls out so all workers together stay under `rpm` requests per minute"""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def is_rate_limit_error(exc):
+    return getattr(exc, "status_code", None) == 429 or "rate limit" in str(exc).lower()
+
+def call_with_retry(limiter, fn, *args, retries=5):
+    """Call an LLM-backed function, backing off on rate-limit errors"""
+    delay = 2.0
+    for attempt in range(retries + 1):
+        limiter.wait()
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == retries or not is_rate_limit_error(e):
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
+# ================= WORKER =================
+
+def warm_question(limiter, question, subject_key, need_answer, need_deep):
+    """Answer one question and write it to the store. Returns a status string."""
+    db = get_db()
+    try:
+        if need_answer:
+            answer, source, question_type, _ = call_with_retry(limiter, answer_question, question, subject_key)
+            answer, is_quality = process_answer(answer)
+            if not is_quality:
+                return "rejected"
+            save_answer(db, question, subject_key, answer, source, question_type)
+        else:
+            cur = db.cursor(dictionary=True)
+            cur.execute(
+                "SELECT answer FROM answer_store WHERE question_hash=%s",
+                (question_key(question, subject_key),)
+            )
+            answer = cur.fetchone()["answer"]
+            cur.close()
+
+        if need_deep:
+            deep_exp = call_with_retry(limiter, generate_deep_explanation, question, answer)
+            save_deep_explanation(db, question, subject_key, sanitize_response(deep_exp))
+
+        return "answered" if need_answer else "deepened"
+    finally:
+        db.close()
+
+# ================= JOB =================
+
+def warm_up(bank_paths, workers=4, rpm=30, deep=False, prune=False, limit=None):
+    limiter = RateLimiter(rpm)
+    stats = {"answered": 0, "deepened": 0, "skipped": 0, "rejected": 0, "failed": 0, "pruned": 0}
+
+    bank = {}
+    for path in bank_paths:
+        for subject_name, questions in load_question_bank(path).items():
+            bank.setdefault(subject_name, []).extend(questions)
+
+    jobs = []
+    db = get_db()
+    cur = db.cursor()
+    try:
+        for subject_name, questions in bank.items():
+            subject_key = map_subject(subject_name)
+            if subject_key not in registered_subjects():
+                print(f"Skipping unknown subject: {subject_name}")
+                continue
+
+            stored = get_stored_keys(cur, subject_key)
+            keys = set()
+            for question in questions:
+                key = question_key(question, subject_key)
+                keys.add(key)
+                need_answer = key not in stored
+                need_deep = deep and not stored.get(key, False)
+                if need_answer or need_deep:
+                    jobs.append((question, subject_key, need_answer, need_deep))
+                else:
+                    stats["skipped"] += 1
+
+            if prune:
+                stats["pruned"] += prune_answers(db, subject_key, keys)
+    finally:
+        cur.close()
+        db.close()
+
+    if limit is not None:
+        jobs = jobs[:limit]
+
+    print(f"{len(jobs)} questions to warm, {stats['skipped']} already stored")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(warm_question, limiter, *job): job[0] for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            question = futures[future]
+            try:
+                status = future.result()
+            except Exception as e:
+                status = "failed"
+                print(f"  failed: {question[:60]} ({e})")
+            stats[status] += 1
+            print(f"[{done}/{len(jobs)}] {status}: {question[:60]}")
+
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers for the exam question bank")
+    parser.add_argument("--bank", action="append", help=f"question bank file (default: {DEFAULT_BANK})")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent questions in flight")
+    parser.add_argument("--rpm", type=float, default=30, help="max LLM requests per minute (0 = unlimited)")
+    parser.add_argument("--deep", action="store_true", help="also precompute deep explanations")
+    parser.add_argument("--prune", action="store_true", help="delete stored answers for removed questions")
+    parser.add_argument("--limit", type=int, help="warm at most this many questions")
+    args = parser.parse_args()
+
+    stats = warm_up(
+        args.bank or [DEFAULT_BANK],
+        workers=args.workers,
+        rpm=args.rpm,
+        deep=args.deep,
+        prune=args.prune,
+        limit=args.limit,
+    )
+    print(", ".join(f"{k}={v}" for k, v in stats.items()))
+
+if __name__ == "__main__":
+    main()